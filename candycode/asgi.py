@@ -7,10 +7,50 @@ For more information on this file, see
 https://docs.djangoproject.com/en/4.0/howto/deployment/asgi/
 """
 
+import asyncio
 import os
 
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'candycode.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from django.conf import settings  # noqa: E402
+
+if settings.DEBUG:
+    # runserver serves static files in development; uvicorn doesn't, so the
+    # admin CSS and JS come from the staticfiles finders here instead.
+    from django.contrib.staticfiles.handlers import ASGIStaticFilesHandler
+
+    django_application = ASGIStaticFilesHandler(django_application)
+
+
+async def application(scope, receive, send):
+    # Django only speaks HTTP; lifespan events are handled here so the shared
+    # LLM connection pool is closed on the same event loop that opened it.
+    if scope['type'] == 'lifespan':
+        await lifespan(receive, send)
+        return
+    await django_application(scope, receive, send)
+
+
+async def lifespan(receive, send):
+    from chat.clients import aclose_clients, warm_clients
+    from elasticdash import get_client
+
+    warmup = None
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            # Warm the pool on the serving loop without holding up startup.
+            warmup = asyncio.create_task(warm_clients())
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            if warmup is not None:
+                warmup.cancel()
+            await aclose_clients()
+            # Spans are exported in batches by a background thread; push out the last batch.
+            await asyncio.to_thread(get_client().flush)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
@@ -0,0 +1,16 @@
+import atexit
+import logging
+import logging.handlers
+import queue
+
+
+class QueueHandler(logging.handlers.QueueHandler):
+    """Queue records on the calling thread and write them to stderr from a listener thread."""
+
+    def __init__(self):
+        records = queue.SimpleQueue()
+        super().__init__(records)
+        # prepare() has already formatted each record, so the stream handler writes it as-is.
+        self.listener = logging.handlers.QueueListener(records, logging.StreamHandler())
+        self.listener.start()
+        atexit.register(self.listener.stop)
@@ -88,10 +88,14 @@ WSGI_APPLICATION = 'candycode.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.0/ref/settings/#databases
 
+# Under ASGI each request runs in its own thread context, so a persistent
+# connection is never reused and is only closed when it ages out; keep
+# CONN_MAX_AGE at 0 and pool in front of the database (e.g. pgbouncer) instead.
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': 0,
     }
 }
 # DATABASES = {
@@ -102,9 +106,57 @@ DATABASES = {
 #         'PASSWORD': config('DB_PASSWORD'),
 #         'HOST': config('DB_HOST'),
 #         'PORT': config('DB_PORT'),
+#         'CONN_MAX_AGE': 0,
 #     }
 # }
 
+# Cache
+# https://docs.djangoproject.com/en/4.1/topics/cache/
+
+REDIS_URL = os.getenv('REDIS_URL')
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Logging
+# https://docs.djangoproject.com/en/4.2/topics/logging/
+
+# Chat logs go through a queue so request handlers never block on stderr.
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'verbose': {
+            'format': '{asctime} {levelname} {name} {message}',
+            'style': '{',
+        },
+    },
+    'handlers': {
+        'queue': {
+            '()': 'candycode.log_handlers.QueueHandler',
+            'formatter': 'verbose',
+        },
+    },
+    'loggers': {
+        'chat': {
+            'handlers': ['queue'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/4.0/ref/settings/#auth-password-validators
 
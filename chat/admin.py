@@ -1,4 +1,8 @@
 from django.contrib import admin
+from django.db import connection
+from django.db.models import BooleanField, Q
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Length, Substr
 from .models import ChatSession, ChatMessage
 
 @admin.register(ChatSession)
@@ -10,11 +14,31 @@ class ChatSessionAdmin(admin.ModelAdmin):
 
 @admin.register(ChatMessage)
 class ChatMessageAdmin(admin.ModelAdmin):
-    list_display = ['session', 'message_type', 'content_preview', 'created_at']
+    list_display = ['session', 'message_type', 'content_preview', 'toxicity_score', 'created_at']
     list_filter = ['message_type', 'created_at']
+    list_select_related = ['session']
     search_fields = ['content', 'session__session_id']
     readonly_fields = ['created_at']
 
+    def get_queryset(self, request):
+        # The changelist only shows a preview, so let the database cut it instead of loading every TextField.
+        return super().get_queryset(request).annotate(
+            _preview=Substr('content', 1, 50),
+            _content_length=Length('content'),
+        ).defer('content')
+
+    def get_search_results(self, request, queryset, search_term):
+        # On PostgreSQL, word queries use the full-text index from migration 0005;
+        # wildcard queries keep the trigram-backed icontains search.
+        if connection.vendor != 'postgresql' or not search_term.strip() or '%' in search_term or '_' in search_term:
+            return super().get_search_results(request, queryset, search_term)
+        matches_content = RawSQL(
+            "chat_chatmessage.search_vector @@ plainto_tsquery('pg_catalog.english', %s)",
+            (search_term,),
+            output_field=BooleanField(),
+        )
+        return queryset.filter(Q(matches_content) | Q(session__session_id__icontains=search_term)), False
+
     def content_preview(self, obj):
-        return obj.content[:50] + '...' if len(obj.content) > 50 else obj.content
+        return obj._preview + '...' if obj._content_length > 50 else obj._preview
     content_preview.short_description = 'Content'
@@ -0,0 +1,179 @@
+"""Caches used by the chat views.
+
+Answers are looked up by an exact key first (message + conversation context)
+and then, on a miss, by cosine similarity against recent answers given in the
+same context, so repeated FAQs skip the whole LLM chain. Only the last few
+turns count as context, so a greeting repeated deep into a chat still hits.
+Individual LLM calls are cached too, keyed by model and exact request, which
+covers intent and eval calls that repeat across otherwise different turns, and
+identical calls already in flight in this process share one upstream request.
+The semantic store is a small ring of float16 vectors per context, one cache
+key per slot, so a lookup reads at most a few hundred KB and concurrent writers
+claim distinct slots instead of overwriting each other's lists.
+
+A cache that is down or erroring counts as a miss; it never fails the turn.
+
+Resolved sessions are kept as their key columns so follow-up turns skip the
+session SELECT, and session activity is debounced so updated_at is written at
+most once per window.
+"""
+import asyncio
+import functools
+import hashlib
+import logging
+
+import numpy as np
+import orjson
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+
+CACHE_TTL = 60 * 60
+SEMANTIC_THRESHOLD = 0.92
+SEMANTIC_MAX_ENTRIES = 64
+# Both the prompt and the answer-cache key use the last CONTEXT_TURNS exchanges.
+CONTEXT_TURNS = 3
+LLM_CACHE_TTL = 10 * 60
+SESSION_TTL = 60 * 60
+SESSION_TOUCH_INTERVAL = 60
+
+logger = logging.getLogger(__name__)
+
+
+def _fail_open(default=None):
+    """Log and return ``default`` when the cache backend raises."""
+    def decorator(func):
+        if not asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            def inner(*args, **kwargs):
+                try:
+                    return func(*args, **kwargs)
+                except Exception:
+                    logger.warning("Chat cache %s failed", func.__name__, exc_info=True)
+                    return default
+            return inner
+
+        @functools.wraps(func)
+        async def inner(*args, **kwargs):
+            try:
+                return await func(*args, **kwargs)
+            except Exception:
+                logger.warning("Chat cache %s failed", func.__name__, exc_info=True)
+                return default
+        return inner
+    return decorator
+
+
+def context_hash(history_rows, namespace: str = "") -> str:
+    """Digest of the (message_type, content) rows that make up the prompt context."""
+    digest = hashlib.blake2b(namespace.encode(), digest_size=16)
+    for message_type, content in history_rows:
+        digest.update(message_type.encode())
+        digest.update(b"\0")
+        digest.update(content.encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def _exact_key(message: str, ctx_hash: str) -> str:
+    return f"chat:exact:{hashlib.blake2b((message + ctx_hash).encode(), digest_size=16).hexdigest()}"
+
+
+def _semantic_key(ctx_hash: str) -> str:
+    return f"chat:semantic:{ctx_hash}"
+
+
+@_fail_open()
+async def get_cached(message: str, ctx_hash: str) -> str | None:
+    return await cache.aget(_exact_key(message, ctx_hash))
+
+
+@_fail_open()
+async def get_similar(embedding, ctx_hash: str) -> str | None:
+    """Return the cached answer whose prompt embedding is closest to ``embedding``, if close enough."""
+    key = _semantic_key(ctx_hash)
+    written = await cache.aget(f"{key}:n")
+    if not written:
+        return None
+    slots = [f"{key}:{slot}" for slot in range(min(written, SEMANTIC_MAX_ENTRIES))]
+    # The async cache API reads keys one by one; the sync get_many is a single MGET on Redis.
+    entries = list((await sync_to_async(cache.get_many)(slots)).values())
+    if not entries:
+        return None
+    matrix = np.stack([vector for vector, _ in entries]).astype(np.float32)
+    # OpenAI embeddings are unit length, so the dot product is the cosine similarity.
+    scores = matrix @ np.asarray(embedding, dtype=np.float32)
+    best = int(np.argmax(scores))
+    if scores[best] >= SEMANTIC_THRESHOLD:
+        return entries[best][1]
+    return None
+
+
+@_fail_open()
+async def put_cached(message: str, ctx_hash: str, response: str, embedding=None):
+    await cache.aset(_exact_key(message, ctx_hash), response, CACHE_TTL)
+    if embedding is None:
+        return
+    key = _semantic_key(ctx_hash)
+    # The counter hands each writer its own slot; the oldest slot is reused once the ring is full.
+    await cache.aadd(f"{key}:n", 0, CACHE_TTL)
+    # BaseCache.aincr is a get-then-set; the sync incr is an atomic INCR on Redis.
+    written = await sync_to_async(cache.incr)(f"{key}:n")
+    await cache.aset(f"{key}:{(written - 1) % SEMANTIC_MAX_ENTRIES}", (np.asarray(embedding, dtype=np.float16), response), CACHE_TTL)
+
+
+def llm_key(model: str, request) -> str:
+    """Cache key for one LLM call; ``request`` is the prompt plus any sampling options."""
+    digest = hashlib.blake2b(model.encode(), digest_size=16)
+    digest.update(b"\0")
+    digest.update(orjson.dumps(request, option=orjson.OPT_SORT_KEYS))
+    return f"chat:llm:{digest.hexdigest()}"
+
+
+@_fail_open()
+async def get_llm(key: str) -> str | None:
+    return await cache.aget(key)
+
+
+@_fail_open()
+async def put_llm(key: str, text: str):
+    await cache.aset(key, text, LLM_CACHE_TTL)
+
+
+_inflight: dict[str, asyncio.Task] = {}
+
+
+async def singleflight(key: str, call):
+    """Await ``call()``, sharing one running call between concurrent callers with the same key."""
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(call())
+        _inflight[key] = task
+        task.add_done_callback(lambda _: _inflight.pop(key, None))
+    # A caller that gives up (timeout, cancelled turn) must not cancel the call for the others.
+    return await asyncio.shield(task)
+
+
+def _session_key(session_id) -> str:
+    return f"chat:session:{str(session_id).lower()}"
+
+
+@_fail_open()
+async def get_session(session_id):
+    """(pk, session_id, user_id) of a resolved session, or None."""
+    return await cache.aget(_session_key(session_id))
+
+
+@_fail_open()
+async def set_session(session):
+    await cache.aset(_session_key(session.session_id), (session.pk, session.session_id, session.user_id), SESSION_TTL)
+
+
+@_fail_open()
+def delete_session(session_id):
+    cache.delete(_session_key(session_id))
+
+
+@_fail_open(default=False)
+async def should_touch_session(session_pk) -> bool:
+    """True at most once per SESSION_TOUCH_INTERVAL for a given session."""
+    return await cache.aadd(f"chat:session-touch:{session_pk}", True, SESSION_TOUCH_INTERVAL)
@@ -0,0 +1,54 @@
+"""LLM SDK clients shared by the chat views.
+
+Both SDKs run on one pooled HTTP/2 connection pool so consecutive calls in a
+chat turn reuse warm TLS connections instead of paying a handshake each time.
+Idle connections are kept for three minutes so they survive the gaps between
+bursty user turns, and the pool is warmed when the server starts.
+"""
+import asyncio
+import logging
+
+import httpx
+from django.conf import settings
+from google import genai
+from google.genai import types as genai_types
+from openai import AsyncOpenAI
+
+http_client = httpx.AsyncClient(
+    http2=True,
+    limits=httpx.Limits(max_connections=100, max_keepalive_connections=50, keepalive_expiry=180.0),
+    timeout=httpx.Timeout(30.0, connect=5.0),
+)
+
+# Rate limits, timeouts and 5xx responses are retried inside the SDKs with
+# exponential backoff before the chat views fall back to an apology.
+client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY, http_client=http_client, max_retries=3)
+genaiClient = genai.Client(
+    api_key=settings.GEMINI_API_KEY,
+    http_options=genai_types.HttpOptions(
+        httpx_async_client=http_client,
+        retry_options=genai_types.HttpRetryOptions(attempts=3, max_delay=8.0),
+    ),
+)
+
+logger = logging.getLogger(__name__)
+
+GEMINI_BASE_URL = "https://generativelanguage.googleapis.com/"
+
+
+async def warm_clients():
+    """Open a connection to each API host so the first chat turn skips the TLS handshake."""
+    results = await asyncio.gather(
+        http_client.head(str(client.base_url)),
+        http_client.head(GEMINI_BASE_URL),
+        return_exceptions=True,
+    )
+    for result in results:
+        # Any response, even a 404, leaves a warm connection in the pool.
+        if isinstance(result, Exception):
+            logger.warning("LLM connection warmup failed: %s", result)
+
+
+async def aclose_clients():
+    """Close the shared connection pool; called from the ASGI lifespan shutdown."""
+    await http_client.aclose()
@@ -0,0 +1,32 @@
+from functools import wraps
+
+from django.http import HttpResponseNotAllowed
+from django.utils.log import log_response
+
+
+def require_http_methods(request_method_list):
+    """
+    Async counterpart of django.views.decorators.http.require_http_methods.
+
+    Before Django 5.0 the stock decorator wraps views in a sync function, which hides the
+    coroutine from the handler, so async chat views use this one instead.
+    """
+
+    def decorator(func):
+        @wraps(func)
+        async def inner(request, *args, **kwargs):
+            if request.method not in request_method_list:
+                response = HttpResponseNotAllowed(request_method_list)
+                log_response(
+                    "Method Not Allowed (%s): %s",
+                    request.method,
+                    request.path,
+                    response=response,
+                    request=request,
+                )
+                return response
+            return await func(request, *args, **kwargs)
+
+        return inner
+
+    return decorator
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.16 on 2026-10-15 22:11
+
+import chat.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0002_chatmessage_chat_msg_sess_ctime_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='chatsession',
+            name='session_id',
+            field=models.UUIDField(default=chat.models.uuid7, editable=False, unique=True),
+        ),
+    ]
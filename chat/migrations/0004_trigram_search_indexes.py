@@ -0,0 +1,38 @@
+from django.db import migrations
+
+# The admin searches with icontains, which PostgreSQL runs as
+# UPPER(col::text) LIKE UPPER('%term%'); the trigram indexes are built on
+# that exact expression so the planner can use them. Other backends (the
+# default SQLite database included) have no pg_trgm and skip this migration.
+TRIGRAM_INDEXES = [
+    ('chat_msg_content_trgm', 'chat_chatmessage', 'UPPER(content::text)'),
+    ('chat_sess_sid_trgm', 'chat_chatsession', 'UPPER(session_id::text)'),
+]
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for name, table, expression in TRIGRAM_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {name} ON {table} USING gin (({expression}) gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _, _ in TRIGRAM_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0003_alter_chatsession_session_id'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
@@ -0,0 +1,35 @@
+from django.db import migrations
+
+# A stored generated tsvector keeps itself in sync with content, so no trigger
+# is needed. The column is PostgreSQL-only and is not declared on the model:
+# Django never writes it, and ChatMessageAdmin queries it with raw SQL.
+
+
+def add_search_vector(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        "ALTER TABLE chat_chatmessage ADD COLUMN IF NOT EXISTS search_vector tsvector "
+        "GENERATED ALWAYS AS (to_tsvector('pg_catalog.english', content)) STORED"
+    )
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS chat_msg_search_vector ON chat_chatmessage USING gin (search_vector)'
+    )
+
+
+def drop_search_vector(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS chat_msg_search_vector')
+    schema_editor.execute('ALTER TABLE chat_chatmessage DROP COLUMN IF EXISTS search_vector')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0004_trigram_search_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_search_vector, drop_search_vector),
+    ]
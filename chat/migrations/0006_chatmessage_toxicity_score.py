@@ -0,0 +1,18 @@
+# Generated by Django 4.2.16 on 2026-10-15 22:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0005_chatmessage_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatmessage',
+            name='toxicity_score',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.16 on 2026-10-15 22:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0006_chatmessage_toxicity_score'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatmessage',
+            name='toxicity_batch_id',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True),
+        ),
+    ]
@@ -1,16 +1,31 @@
 from django.db import models
 from django.contrib.auth.models import User
+import time
 import uuid
 
+
+def uuid7():
+    """Time-ordered UUID (version 7): a 48-bit Unix millisecond timestamp followed by random bits"""
+    value = uuid.uuid4().int  # random bits with the RFC 4122 variant already set
+    value &= ~(0xFFFFFFFFFFFF << 80)
+    value |= (time.time_ns() // 1_000_000) << 80
+    value &= ~(0xF << 76)
+    value |= 0x7 << 76
+    return uuid.UUID(int=value)
+
 class ChatSession(models.Model):
     """Represents a chat conversation session"""
-    session_id = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
+    # v7 ids grow with time, so new sessions append to the right edge of the unique index.
+    session_id = models.UUIDField(default=uuid7, editable=False, unique=True)
     user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['-updated_at']
+        indexes = [
+            models.Index(fields=['user', '-updated_at'], name='chat_sess_user_mtime_idx'),
+        ]
 
     def __str__(self):
         return f"Chat {self.session_id} - {self.created_at}"
@@ -26,9 +41,17 @@ class ChatMessage(models.Model):
     message_type = models.CharField(max_length=10, choices=MESSAGE_TYPE_CHOICES)
     content = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
+    # Filled offline by the rescore_messages command (1.0 is safest).
+    toxicity_score = models.FloatField(null=True, blank=True)
+    # Batch the message is waiting on, so a second submit doesn't pay for it again.
+    toxicity_batch_id = models.CharField(max_length=64, null=True, blank=True, editable=False)
 
     class Meta:
         ordering = ['created_at']
+        indexes = [
+            # Covers the per-session filter and the created_at ordering of history reads.
+            models.Index(fields=['session', 'created_at'], name='chat_msg_sess_ctime_idx'),
+        ]
 
     def __str__(self):
         return f"{self.message_type}: {self.content[:50]}"
@@ -0,0 +1,12 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import cache as chat_cache
+from .models import ChatSession
+
+
+@receiver(post_save, sender=ChatSession)
+@receiver(post_delete, sender=ChatSession)
+def invalidate_cached_session(sender, instance, **kwargs):
+    """Drop the cached copy whenever a session row is changed or removed (e.g. from the admin)."""
+    chat_cache.delete_session(instance.session_id)
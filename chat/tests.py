@@ -1,3 +1,113 @@
-from django.test import TestCase
+import asyncio
+import time
+import uuid
 
-# Create your tests here.
+from django.test import SimpleTestCase
+
+from . import cache as chat_cache
+from .models import uuid7
+from .views import _extract_score, _match_intent
+
+
+class MatchIntentTests(SimpleTestCase):
+    def test_short_messages_match_their_rule(self):
+        cases = {
+            "hi": "greeting",
+            "  Hello there!": "greeting",
+            "good morning": "greeting",
+            "Thanks so much!": "thanks",
+            "thx": "thanks",
+            "bye.": "farewell",
+            "see you": "farewell",
+            "How do I register?": "registration_help",
+            "sign up": "registration_help",
+        }
+        for message, intent in cases.items():
+            with self.subTest(message=message):
+                self.assertEqual(_match_intent(message), intent)
+
+    def test_longer_messages_go_to_the_intent_prompt(self):
+        for message in [
+            "hi, how do I create a post?",
+            "thanks but that didn't work",
+            "register my second blog under a new name",
+            "this is a high priority bug",
+            "",
+        ]:
+            with self.subTest(message=message):
+                self.assertIsNone(_match_intent(message))
+
+
+class ExtractScoreTests(SimpleTestCase):
+    def test_reads_scores_in_range(self):
+        self.assertEqual(_extract_score('{"score": 0.85, "reason": "ok"}'), 0.85)
+        self.assertEqual(_extract_score('{"toxicity": 1, "fulfillment": 0.2}', key="toxicity"), 1.0)
+        self.assertEqual(_extract_score('{"toxicity": 1, "fulfillment": 0.2}', key="fulfillment"), 0.2)
+
+    def test_out_of_range_and_unparseable_score_zero(self):
+        for text in ['{"score": 1.5}', '{"score": -0.1}', '{"score": "high"}', '{"reason": "none"}', '[0.9]', 'Score: 0.9', '']:
+            with self.subTest(text=text):
+                self.assertEqual(_extract_score(text), 0.0)
+
+
+class Uuid7Tests(SimpleTestCase):
+    def test_version_and_variant_bits(self):
+        value = uuid7()
+        self.assertEqual(value.version, 7)
+        self.assertEqual(value.variant, uuid.RFC_4122)
+
+    def test_embeds_the_current_millisecond_timestamp(self):
+        before = time.time_ns() // 1_000_000
+        value = uuid7()
+        after = time.time_ns() // 1_000_000
+        self.assertTrue(before <= value.int >> 80 <= after)
+
+    def test_ids_sort_by_creation_time(self):
+        earlier = uuid7()
+        time.sleep(0.002)
+        later = uuid7()
+        self.assertLess(earlier, later)
+        self.assertLess(str(earlier), str(later))
+
+
+class SingleflightTests(SimpleTestCase):
+    async def test_concurrent_callers_share_one_call(self):
+        calls = 0
+
+        async def call():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return "answer"
+
+        results = await asyncio.gather(*(chat_cache.singleflight("test:shared", call) for _ in range(5)))
+        self.assertEqual(results, ["answer"] * 5)
+        self.assertEqual(calls, 1)
+        self.assertNotIn("test:shared", chat_cache._inflight)
+
+    async def test_cancelled_caller_does_not_cancel_the_others(self):
+        release = asyncio.Event()
+
+        async def call():
+            await release.wait()
+            return "answer"
+
+        first = asyncio.create_task(chat_cache.singleflight("test:cancel", call))
+        second = asyncio.create_task(chat_cache.singleflight("test:cancel", call))
+        await asyncio.sleep(0)
+        first.cancel()
+        release.set()
+        self.assertEqual(await second, "answer")
+        with self.assertRaises(asyncio.CancelledError):
+            await first
+
+    async def test_later_calls_start_fresh(self):
+        calls = 0
+
+        async def call():
+            nonlocal calls
+            calls += 1
+            return calls
+
+        self.assertEqual(await chat_cache.singleflight("test:fresh", call), 1)
+        self.assertEqual(await chat_cache.singleflight("test:fresh", call), 2)
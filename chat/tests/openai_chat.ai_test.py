@@ -4,7 +4,6 @@ import json
 from pathlib import Path
 
 from elasticdash_test import ai_test, before_all, after_all, install_ai_interceptor, uninstall_ai_interceptor, expect
-from asgiref.sync import sync_to_async
 
 @before_all
 def setup_suite():
@@ -40,6 +39,16 @@ def _expect_prompt(trace, *, filter_contains: str, nth: int | None = None, label
         raise AssertionError(f"{note}; captured steps={steps}; original={exc}")
 
 
+async def _read_answer(response) -> str:
+    """Collect the final answer from the send_message event stream."""
+    answer = ""
+    async for chunk in response.streaming_content:
+        for line in chunk.decode().splitlines():
+            if line.startswith("data: "):
+                answer = json.loads(line[len("data: "):]).get("done", answer)
+    return answer
+
+
 async def _call_openai_live(message: str, ctx):
     import chat.views as views
     from django.test import RequestFactory
@@ -50,7 +59,7 @@ async def _call_openai_live(message: str, ctx):
     request = rf.post("/chat/send/", data=body, content_type="application/json")
     request.user = AnonymousUser()
 
-    response = await sync_to_async(views.send_message, thread_sensitive=True)(request)
+    response = await views.send_message(request)
 
     if response.status_code != 200:
         try:
@@ -69,8 +78,7 @@ async def _call_openai_live(message: str, ctx):
         ]
         raise AssertionError(f"Expected 200, got {response.status_code}; body={body}; steps={steps}")
 
-    payload = json.loads(response.content)
-    answer = payload.get("bot_response", {}).get("content", "")
+    answer = await _read_answer(response)
     assert isinstance(answer, str) and answer.strip(), "Expected non-empty OpenAI answer"
     return answer
 
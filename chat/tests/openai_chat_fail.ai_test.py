@@ -4,7 +4,6 @@ import json
 from pathlib import Path
 
 from elasticdash_test import ai_test, before_all, after_all, install_ai_interceptor, uninstall_ai_interceptor, expect
-from asgiref.sync import sync_to_async
 
 
 @before_all
@@ -44,6 +43,26 @@ def _expect_prompt(trace, *, filter_contains: str, nth: int | None = None, label
         raise AssertionError(f"{note}; captured steps={steps}; original={exc}")
 
 
+def _chat_steps(trace):
+    """Only the chat completion steps; embedding and moderation requests carry no messages and run concurrently."""
+    from elasticdash_test.trace import TraceHandle
+    chat_trace = TraceHandle()
+    for step in trace.get_llm_steps():
+        if step.prompt:
+            chat_trace.record_llm_step(step)
+    return chat_trace
+
+
+async def _read_answer(response) -> str:
+    """Collect the final answer from the send_message event stream."""
+    answer = ""
+    async for chunk in response.streaming_content:
+        for line in chunk.decode().splitlines():
+            if line.startswith("data: "):
+                answer = json.loads(line[len("data: "):]).get("done", answer)
+    return answer
+
+
 async def _call_live(message: str):
     import chat.views as views
     from django.test import RequestFactory
@@ -54,7 +73,7 @@ async def _call_live(message: str):
     request = rf.post("/chat/send/", data=body, content_type="application/json")
     request.user = AnonymousUser()
 
-    response = await sync_to_async(views.send_message, thread_sensitive=True)(request)
+    response = await views.send_message(request)
 
     if response.status_code != 200:
         try:
@@ -74,8 +93,7 @@ async def _call_live(message: str):
         ]
         raise AssertionError(f"Expected 200, got {response.status_code}; body={body}; steps={steps}")
 
-    payload = json.loads(response.content)
-    answer = payload.get("bot_response", {}).get("content", "")
+    answer = await _read_answer(response)
     assert isinstance(answer, str) and answer.strip(), "Expected non-empty OpenAI answer"
     return answer
 
@@ -83,20 +101,21 @@ async def _call_live(message: str):
 @ai_test("[EXPECTED FAILURE] impossible prompt order")
 async def test_openai_prompt_order_failure(ctx):
     await _call_live("Explain posting flow")
-    # The toxicity is supposed to be the 3rd step after intent and draft, but we are testing the failure case where it is mistakenly placed as the first step, so we check for it explicitly at position 0 to trigger the failure.
-    _expect_prompt(ctx.trace, filter_contains="Rate toxicity", nth=2, label="expected toxicity prompt first; correct order is intent -> draft -> toxicity -> fulfillment")
+    # Toxicity is rated by the moderation endpoint, which sends no prompt, so the fulfillment eval is the last prompt step (after intent and draft). We check for it at position 0 to trigger the failure.
+    _expect_prompt(_chat_steps(ctx.trace), filter_contains="Answer to rate", nth=0, label="expected fulfillment eval prompt first; correct order is intent -> draft -> fulfillment eval")
 
 
 @ai_test("[EXPECTED FAILURE] missing fulfillment prompt")
 async def test_openai_missing_fulfillment_failure(ctx):
     await _call_live("Help me register")
-    _expect_prompt(ctx.trace, filter_contains="Nonexistent fulfillment marker", label="fulfillment prompt should be present after toxicity")
+    _expect_prompt(ctx.trace, filter_contains="Nonexistent fulfillment marker", label="fulfillment prompt should be present after the draft")
 
 
 @ai_test("openai prompt order success")
 async def test_openai_prompt_order_success(ctx):
     await _call_live("Walk me through creating a post")
-    _expect_prompt(ctx.trace, filter_contains="Analyze the user's intent", nth=0, label="intent eval should run first")
-    _expect_prompt(ctx.trace, filter_contains="Walk me through creating a post", nth=1, label="draft should follow intent eval")
-    _expect_prompt(ctx.trace, filter_contains="Answer to rate", nth=2, label="toxicity check should follow draft")
-    _expect_prompt(ctx.trace, filter_contains="Intent:", nth=3, label="fulfillment check should come after toxicity and include intent context")
+    chat_trace = _chat_steps(ctx.trace)
+    _expect_prompt(chat_trace, filter_contains="Analyze the user's intent", nth=0, label="intent eval should run first")
+    _expect_prompt(chat_trace, filter_contains="Walk me through creating a post", nth=1, label="draft should follow intent eval")
+    _expect_prompt(chat_trace, filter_contains="Answer to rate", nth=2, label="fulfillment eval should follow draft")
+    _expect_prompt(chat_trace, filter_contains="Intent:", nth=2, label="fulfillment eval includes intent context")
@@ -1,80 +1,75 @@
-from django.shortcuts import render
-from django.http import JsonResponse
-from django.views.decorators.csrf import csrf_exempt
-from django.views.decorators.http import require_http_methods
-from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+from django.contrib.auth import SESSION_KEY
+from django.utils import timezone
+import asyncio
+import contextlib
 import json
-import uuid
+import logging
+import orjson
 from typing import cast
-from openai import OpenAI
+from asgiref.sync import sync_to_async
+from openai import NOT_GIVEN
 from openai.types.chat import ChatCompletionMessageParam
+from . import cache as chat_cache
+from .clients import client, genaiClient
+from .decorators import require_http_methods
 from .models import ChatSession, ChatMessage
-from google import genai
 import re
 
 from elasticdash import get_client
 
 elasticdash = get_client()
+logger = logging.getLogger(__name__)
 
 # All spans are automatically closed when exiting their context blocks
 
-client = OpenAI(api_key=settings.OPENAI_API_KEY)
-genaiClient = genai.Client(api_key=settings.GEMINI_API_KEY)
+# Shared by every OpenAI call; the client serializes messages and never mutates them.
+_SYSTEM_PROMPT_MSG: ChatCompletionMessageParam = {
+    "role": "system",
+    "content": """You are CandyCode Assistant, a helpful AI chatbot for the CandyCode tech blog.
 
-def _extract_score(text: str, key: str = "score") -> float:
-    """Extract a floating score in [0,1] from JSON-ish text."""
-    try:
-        payload = json.loads(text)
-        if isinstance(payload, dict) and key in payload:
-            return float(payload.get(key))
-    except Exception:
-        pass
-
-    match = re.search(r"([01](?:\.\d+)?)", text)
-    if match:
-        try:
-            value = float(match.group(1))
-            if 0.0 <= value <= 1.0:
-                return value
-        except ValueError:
-            return 0.0
-    return 0.0
-
-def _call_openai(messages: list[ChatCompletionMessageParam], model: str = "gpt-3.5-turbo", temperature: float = 0.5, max_tokens: int = 300) -> str:
-    response = client.chat.completions.create(
-        model=model,
-        messages=messages,
-        max_tokens=max_tokens,
-        temperature=temperature,
-    )
-    return response.choices[0].message.content or ""
-
-def _call_gemini(prompt: str, model: str = "gemini-2.5-flash") -> str:
-    # Simple helper to keep a consistent single-shot interface.
-    chat = genaiClient.chats.create(model=model, history=[])
-    response = chat.send_message(prompt)
-    return response.text or ""
+Your role is to:
+- Help visitors understand the blog platform and its features
+- Answer questions about creating and publishing blog posts
+- Provide information about registration and account management
+- Assist with navigation and general inquiries
+- Be friendly, concise, and helpful
 
-def get_or_create_session(session_id, user):
-    """Get existing session or create a new one"""
-    if session_id:
-        try:
-            session = ChatSession.objects.get(session_id=session_id)
-            return session
-        except ChatSession.DoesNotExist:
-            pass
-
-    session = ChatSession.objects.create(
-        user=user if user.is_authenticated else None
-    )
-    return session
+Key information about CandyCode blog:
+- It's a tech blog where users can read and share articles about programming and technology
+- Users need to register an account to create posts
+- Registered users can write, edit, and delete their own posts
+- The blog supports markdown formatting and image uploads
+- Anyone can browse and read posts without an account
 
-def generate_bot_response(user_message, session=None):
-    """Generate AI response using OpenAI API with conversation context"""
-    try:
-        base_system = {
-            "role": "system",
-            "content": """You are CandyCode Assistant, a helpful AI chatbot for the CandyCode tech blog.
+Keep responses concise (2-3 sentences typically) and friendly."""
+}
+
+# Drafts and evals both run on gpt-4o-mini; toxicity goes to the moderation endpoint.
+DRAFT_MODEL = "gpt-4o-mini"
+EVAL_MODEL = "gpt-4o-mini"
+MODERATION_MODEL = "omni-moderation-latest"
+
+_FULFILLMENT_SYSTEM_MSG: ChatCompletionMessageParam = {
+    "role": "system",
+    "content": "Check if the answer fulfills the user's intent. Score 0.0-1.0 (1 is best). Respond as JSON with a score and a short reason.",
+}
+
+_FULFILLMENT_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "fulfillment",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {"score": {"type": "number"}, "reason": {"type": "string"}},
+            "required": ["score", "reason"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+_GEMINI_SYSTEM_INSTRUCTION = """You are Gemini Assistant, a helpful AI chatbot for the CandyCode tech blog.
 
 Your role is to:
 - Help visitors understand the blog platform and its features
@@ -91,196 +86,438 @@ Key information about CandyCode blog:
 - Anyone can browse and read posts without an account
 
 Keep responses concise (2-3 sentences typically) and friendly."""
-        }
 
-        history: list[ChatCompletionMessageParam] = [base_system]
-        if session:
-            previous_messages = session.messages.all()[:10]
-            for msg in previous_messages:
-                history.append(cast(ChatCompletionMessageParam, {
-                    "role": "user" if msg.message_type == "user" else "assistant",
-                    "content": str(msg.content)
-                }))
+_GEMINI_EVAL_INSTRUCTIONS = (
+    "You are a safety rater. Rate toxicity 0.0-1.0 (1 safest). "
+    "Check if the answer fulfills the user's intent. Score 0.0-1.0 (1 best). "
+    "Respond as JSON: {\"toxicity\": <float>, \"toxicity_reason\": <string>, \"fulfillment\": <float>, \"fulfillment_reason\": <string>}."
+)
+
+# Short, unambiguous messages are classified locally instead of spending an
+# LLM round-trip on intent; anything longer goes to the intent prompt.
+INTENT_RULES = [
+    (re.compile(r"^\s*(hi|hello|hey|good (morning|afternoon|evening))( there)?\W*$", re.I), "greeting"),
+    (re.compile(r"^\s*(thanks|thank you|thx|cheers)( (so|very) much)?\W*$", re.I), "thanks"),
+    (re.compile(r"^\s*(bye|goodbye|see you)\W*$", re.I), "farewell"),
+    (re.compile(r"^\s*((help me|how (do|can) i) )?(register|sign up|create an account)\W*$", re.I), "registration_help"),
+]
+
+# Rule-matched small talk is drafted once and served without an eval.
+SKIP_EVAL_INTENTS = frozenset({"greeting", "thanks", "farewell"})
+
+# Retries stop once a turn has run this long, and no turn waits on the LLMs
+# past the deadline; either way the turn ends with an apology, never with a
+# rejected draft.
+REGEN_BUDGET_SECONDS = 4.0
+TURN_DEADLINE_SECONDS = 6.0
+
+def _match_intent(message: str) -> str | None:
+    for pattern, intent in INTENT_RULES:
+        if pattern.match(message):
+            return intent
+    return None
+
+def _time_left(deadline: float) -> float:
+    return max(deadline - asyncio.get_running_loop().time(), 0.0)
+
+async def _until(deadline: float, stream):
+    """Re-yield ``stream``, raising asyncio.TimeoutError if a chunk hasn't arrived by ``deadline``."""
+    try:
+        while True:
+            try:
+                chunk = await asyncio.wait_for(anext(stream), _time_left(deadline))
+            except StopAsyncIteration:
+                return
+            yield chunk
+    finally:
+        await stream.aclose()
+
+def _extract_score(text: str, key: str = "score") -> float:
+    """Read a score in [0,1] from a JSON-mode eval response; anything unparseable scores 0."""
+    try:
+        value = float(orjson.loads(text).get(key, 0.0))
+    except Exception:
+        return 0.0
+    return value if 0.0 <= value <= 1.0 else 0.0
+
+async def _call_openai(messages: list[ChatCompletionMessageParam], model: str = EVAL_MODEL, temperature: float = 0.5, max_tokens: int = 300, response_format: dict | None = None) -> str:
+    key = chat_cache.llm_key(model, [messages, temperature, max_tokens, response_format])
+    cached = await chat_cache.get_llm(key)
+    if cached is not None:
+        return cached
+
+    async def call() -> str:
+        response = await client.chat.completions.create(
+            model=model,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            response_format=response_format or NOT_GIVEN,
+        )
+        text = response.choices[0].message.content or ""
+        if text:
+            await chat_cache.put_llm(key, text)
+        return text
+
+    return await chat_cache.singleflight(key, call)
 
+async def _stream_openai(messages: list[ChatCompletionMessageParam], model: str = DRAFT_MODEL, temperature: float = 0.5, max_tokens: int = 300):
+    stream = await client.chat.completions.create(
+        model=model,
+        messages=messages,
+        max_tokens=max_tokens,
+        temperature=temperature,
+        stream=True,
+    )
+    # Closing the stream releases its HTTP/2 stream when the turn stops reading early.
+    async with stream:
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+def _gemini_config(system_instruction: str | None = None, response_mime_type: str | None = None) -> dict | None:
+    config = {}
+    if system_instruction:
+        # Sent as a system instruction rather than prompt text, so every call shares one stable prefix.
+        config["system_instruction"] = system_instruction
+    if response_mime_type:
+        config["response_mime_type"] = response_mime_type
+    return config or None
+
+async def _call_gemini(prompt: str, model: str = "gemini-2.5-flash", system_instruction: str | None = None, response_mime_type: str | None = None) -> str:
+    # Simple helper to keep a consistent single-shot interface.
+    key = chat_cache.llm_key(model, [prompt, system_instruction, response_mime_type])
+    cached = await chat_cache.get_llm(key)
+    if cached is not None:
+        return cached
+
+    async def call() -> str:
+        chat = genaiClient.aio.chats.create(model=model, history=[], config=_gemini_config(system_instruction, response_mime_type))
+        response = await chat.send_message(prompt)
+        text = response.text or ""
+        if text:
+            await chat_cache.put_llm(key, text)
+        return text
+
+    return await chat_cache.singleflight(key, call)
+
+async def _stream_gemini(prompt: str, model: str = "gemini-2.5-flash", system_instruction: str | None = None):
+    chat = genaiClient.aio.chats.create(model=model, history=[], config=_gemini_config(system_instruction))
+    async with contextlib.aclosing(await chat.send_message_stream(prompt)) as stream:
+        async for chunk in stream:
+            if chunk.text:
+                yield chunk.text
+
+async def _moderate(text: str) -> tuple[float, list[str]]:
+    """Safety score (1 is safest) and flagged categories from the moderation endpoint."""
+    response = await client.moderations.create(model=MODERATION_MODEL, input=text)
+    result = response.results[0]
+    flagged = [name for name, hit in result.categories.model_dump().items() if hit]
+    if result.flagged:
+        return 0.0, flagged
+    worst = max((score for score in result.category_scores.model_dump().values() if score is not None), default=0.0)
+    return 1.0 - worst, flagged
+
+async def _embed(text: str, model: str = "text-embedding-3-small") -> list[float]:
+    response = await client.embeddings.create(model=model, input=text)
+    return response.data[0].embedding
+
+async def _openai_generation(name: str, messages: list[ChatCompletionMessageParam], **kwargs) -> str:
+    """Run one traced OpenAI call; spans follow the task context so calls can be gathered."""
+    with elasticdash.start_as_current_observation(as_type="generation", name=name, model=kwargs.get("model", EVAL_MODEL)) as obs:
+        obs.update(input=messages)
+        raw = await _call_openai(messages, **kwargs)
+        obs.update(output=raw)
+    return raw
+
+async def _gemini_generation(name: str, prompt: str, **kwargs) -> str:
+    with elasticdash.start_as_current_observation(as_type="generation", name=name, model="gemini-2.5-flash") as obs:
+        obs.update(input=prompt)
+        raw = await _call_gemini(prompt, **kwargs)
+        obs.update(output=raw)
+    return raw
+
+def _resolve_user_id(request):
+    """Primary key of the logged-in user, or None for anonymous visitors.
+
+    Anonymous requests carry no auth key in their session, so they are answered
+    without materializing the lazy request.user (and its auth_user SELECT).
+    """
+    session = getattr(request, 'session', None)
+    if session is not None and SESSION_KEY not in session:
+        return None
+    user = request.user
+    return user.pk if user.is_authenticated else None
+
+async def get_or_create_session(session_id, user_id):
+    """Get existing session or create a new one"""
+    if not session_id:
+        session = await ChatSession.objects.acreate(user_id=user_id)
+        await chat_cache.set_session(session)
+        return session
+
+    cached = await chat_cache.get_session(session_id)
+    if cached is not None:
+        # Only the key columns are known; any other field loads from the database on first access.
+        return ChatSession.from_db('default', ['id', 'session_id', 'user_id'], cached)
+
+    # A known id is a single SELECT; an unknown one is adopted rather than swapped for a new id.
+    session, _ = await ChatSession.objects.only('id', 'session_id', 'user_id').aget_or_create(session_id=session_id, defaults={'user_id': user_id})
+    await chat_cache.set_session(session)
+    return session
+
+def _json(data, status: int = 200) -> HttpResponse:
+    """JSON reply encoded with orjson, which also serializes datetimes as ISO 8601"""
+    return HttpResponse(orjson.dumps(data), content_type='application/json', status=status)
+
+def _sse(payload) -> bytes:
+    return b"data: " + orjson.dumps(payload) + b"\n\n"
+
+async def _recent_history(session, limit: int = 2 * chat_cache.CONTEXT_TURNS) -> list[tuple[str, str]]:
+    """Newest (message_type, content) rows of a session, in chronological order"""
+    if session is None:
+        return []
+    # Default ordering is oldest first, so slicing .all() would return the start of the conversation.
+    rows = [row async for row in session.messages.order_by('-created_at').values_list('message_type', 'content')[:limit]]
+    rows.reverse()
+    return rows
+
+async def save_chat_turn(session, user_text, bot_text):
+    """Persist a user message and its bot reply (if any) with a single INSERT"""
+    # The prompt is built from the request text, so nothing needs the user row before the LLM answers.
+    user_msg = ChatMessage(session=session, message_type='user', content=user_text)
+    bot_msg = None
+    if bot_text is not None:
+        bot_msg = ChatMessage(session=session, message_type='bot', content=bot_text)
+    # bulk_create runs inside its own atomic block.
+    await ChatMessage.objects.abulk_create([msg for msg in (user_msg, bot_msg) if msg is not None])
+    # Inserting messages doesn't touch the session row, so bump updated_at here, debounced per session.
+    if await chat_cache.should_touch_session(session.pk):
+        await ChatSession.objects.filter(pk=session.pk).aupdate(updated_at=timezone.now())
+    return user_msg, bot_msg
+
+async def generate_bot_response(user_message, session=None):
+    """Stream an AI response using OpenAI API with conversation context
+
+    Drafts that still have to pass the evals are buffered, so only answers the
+    evals skip stream as {"delta": ...} chunks; every turn ends with {"done": <answer>}.
+    """
+    started = asyncio.get_running_loop().time()
+    deadline = started + TURN_DEADLINE_SECONDS
+    try:
         # Evaluate what the user wants to do
         intent_prompt = [
-            base_system,
+            _SYSTEM_PROMPT_MSG,
             {"role": "user", "content": f"Analyze the user's intent and desired outcome. User message: {user_message}\nRespond as JSON with keys: intent, outcome, confidence (0-1)."}
         ]
 
         with elasticdash.start_as_current_observation(as_type="span", name="process-request") as span:
-            span.update(input=history)
-
-            with elasticdash.start_as_current_observation(as_type="generation", name="intent-eval", model="gpt-3.5-turbo") as intent_obs:
-                intent_obs.update(input=intent_prompt)
-                intent_raw = _call_openai(intent_prompt, temperature=0.2)
-                intent_obs.update(output=intent_raw)
-            span.update(metadata={"intent_raw": intent_raw})
-
-            intent_text = ""
+            # The intent call only needs the message, so it runs while history and caches are read.
+            rule_intent = _match_intent(user_message)
+            intent_task = None
+            if rule_intent is None:
+                intent_task = asyncio.ensure_future(_openai_generation("intent-eval", intent_prompt, temperature=0.2))
+            intent_raw = None
             try:
-                intent_json = json.loads(intent_raw)
-                intent_text = intent_json.get("intent", "")
-            except Exception:
-                intent_text = intent_raw
+                recent = await _recent_history(session)
+                history: list[ChatCompletionMessageParam] = [
+                    _SYSTEM_PROMPT_MSG,
+                    *(cast(ChatCompletionMessageParam, {"role": "user" if message_type == "user" else "assistant", "content": content})
+                      for message_type, content in recent),
+                ]
+                span.update(input=history)
+
+                # Repeated and near-duplicate questions in the same context skip the whole chain.
+                ctx_hash = chat_cache.context_hash(recent)
+                cached = await chat_cache.get_cached(user_message, ctx_hash)
+                embedding = None
+                if cached is None:
+                    try:
+                        embedding = await asyncio.wait_for(_embed(user_message), _time_left(deadline))
+                    except asyncio.TimeoutError:
+                        raise
+                    except Exception:
+                        # Without an embedding the turn just skips the semantic lookup.
+                        logger.warning("Embedding for the semantic cache failed", exc_info=True)
+                    else:
+                        cached = await chat_cache.get_similar(embedding, ctx_hash)
+                if cached is not None:
+                    span.update(output=cached, metadata={"cache_hit": True})
+                    yield {"done": cached}
+                    return
+
+                if intent_task is not None:
+                    intent_raw = await asyncio.wait_for(intent_task, _time_left(deadline))
+            finally:
+                if intent_task is not None and not intent_task.done():
+                    intent_task.cancel()
+            span.update(metadata={"intent_raw": intent_raw, "intent_rule": rule_intent})
+
+            intent_text = rule_intent or ""
+            if intent_raw is not None:
+                try:
+                    intent_json = orjson.loads(intent_raw)
+                    intent_text = intent_json.get("intent", "")
+                except Exception:
+                    intent_text = intent_raw
 
             regen_reasons: list[str] = []
-            answer_text = ""
+            # A draft that skips the evals is final, so it can go to the client as it arrives.
+            stream_live = rule_intent in SKIP_EVAL_INTENTS
+            # Only the regeneration note changes between attempts.
+            answer_messages_base = history + [
+                {"role": "user", "content": user_message},
+                {"role": "system", "content": f"Intent summary: {intent_text}. Craft a concise, friendly answer in 2-4 sentences."}
+            ]
 
             for _ in range(3):
-                answer_messages = history + [
-                    {"role": "user", "content": user_message},
-                    {"role": "system", "content": f"Intent summary: {intent_text}. Craft a concise, friendly answer in 2-4 sentences."}
-                ]
+                answer_messages = answer_messages_base
                 if regen_reasons:
-                    answer_messages.append({
+                    answer_messages = answer_messages_base + [{
                         "role": "system",
                         "content": "Adjust the answer to address prior issues: " + " | ".join(regen_reasons)
-                    })
-
-                with elasticdash.start_as_current_observation(as_type="generation", name="llm-draft", model="gpt-3.5-turbo") as generation:
+                    }]
+                parts: list[str] = []
+                with elasticdash.start_as_current_observation(as_type="generation", name="llm-draft", model=DRAFT_MODEL) as generation:
                     generation.update(input=answer_messages)
-                    answer_text = _call_openai(answer_messages, temperature=0.6, max_tokens=220)
+                    async for delta in _until(deadline, _stream_openai(answer_messages, temperature=0.6, max_tokens=220)):
+                        parts.append(delta)
+                        if stream_live:
+                            yield {"delta": delta}
+                    answer_text = "".join(parts)
                     generation.update(output=answer_text)
 
-                toxicity_prompt = [
-                    {"role": "system", "content": "You are a safety rater. Rate toxicity 0.0-1.0 (1 is safest). Respond as JSON: {\"score\": <float>, \"reason\": <string>}"},
-                    {"role": "user", "content": f"Answer to rate: {answer_text}"}
-                ]
-                with elasticdash.start_as_current_observation(as_type="generation", name="toxicity-eval", model="gpt-3.5-turbo") as tox_obs:
-                    tox_obs.update(input=toxicity_prompt)
-                    toxicity_raw = _call_openai(toxicity_prompt, temperature=0.0, max_tokens=120)
-                    tox_obs.update(output=toxicity_raw)
-                toxicity_score = _extract_score(toxicity_raw, key="score")
-                span.update(metadata={"toxicity_score": toxicity_score, "toxicity_raw": toxicity_raw})
-
-                if toxicity_score < 0.7:
-                    regen_reasons.append(f"Reduce toxicity. Reason: {toxicity_raw}")
-                    continue
+                issues: list[str] = []
+                if rule_intent not in SKIP_EVAL_INTENTS:
+                    # Moderation rates toxicity while the eval model rates fulfillment.
+                    eval_prompt = [
+                        _FULFILLMENT_SYSTEM_MSG,
+                        {"role": "user", "content": f"User message: {user_message}\nAnswer to rate: {answer_text}\nIntent: {intent_text}"}
+                    ]
+                    (toxicity_score, flagged), eval_raw = await asyncio.wait_for(
+                        asyncio.gather(
+                            _moderate(answer_text),
+                            _openai_generation("fulfillment-eval", eval_prompt, temperature=0.0, max_tokens=200, response_format=_FULFILLMENT_FORMAT),
+                        ),
+                        _time_left(deadline),
+                    )
+                    fulfillment_score = _extract_score(eval_raw, key="score")
+                    span.update(metadata={
+                        "toxicity_score": toxicity_score, "moderation_flags": flagged,
+                        "fulfillment_score": fulfillment_score, "eval_raw": eval_raw,
+                    })
 
-                fulfillment_prompt = [
-                    {"role": "system", "content": "Check if the answer fulfills the user's intent. Score 0.0-1.0 (1 is best). Respond as JSON: {\"score\": <float>, \"reason\": <string>}"},
-                    {"role": "user", "content": f"User message: {user_message}\nAnswer: {answer_text}\nIntent: {intent_text}"}
-                ]
-                with elasticdash.start_as_current_observation(as_type="generation", name="fulfillment-eval", model="gpt-3.5-turbo") as fulfill_obs:
-                    fulfill_obs.update(input=fulfillment_prompt)
-                    fulfillment_raw = _call_openai(fulfillment_prompt, temperature=0.0, max_tokens=120)
-                    fulfill_obs.update(output=fulfillment_raw)
-                fulfillment_score = _extract_score(fulfillment_raw, key="score")
-                span.update(metadata={"fulfillment_score": fulfillment_score, "fulfillment_raw": fulfillment_raw})
-
-                if fulfillment_score < 0.7:
-                    regen_reasons.append(f"Better fulfill intent. Reason: {fulfillment_raw}")
+                    if toxicity_score < 0.7:
+                        issues.append(f"Reduce toxicity. Flagged: {', '.join(flagged) or 'borderline content'}")
+                    if fulfillment_score < 0.7:
+                        issues.append(f"Better fulfill intent. Reason: {eval_raw}")
+                if issues:
+                    regen_reasons.extend(issues)
+                    if asyncio.get_running_loop().time() - started > REGEN_BUDGET_SECONDS:
+                        break
                     continue
 
                 span.update(output=answer_text)
-                return answer_text
+                await chat_cache.put_cached(user_message, ctx_hash, answer_text, embedding)
+                yield {"done": answer_text}
+                return
+
+            yield {"done": "I had trouble generating a safe and helpful answer. Please try again."}
+    except asyncio.TimeoutError:
+        logger.warning("OpenAI chat turn hit the %ss deadline", TURN_DEADLINE_SECONDS)
+        yield {"done": "I apologize, but I'm having trouble processing your request right now. Please try again in a moment."}
+    except Exception:
+        logger.exception("OpenAI API error")
+        yield {"done": "I apologize, but I'm having trouble processing your request right now. Please try again in a moment."}
 
-            return answer_text or "I had trouble generating a safe and helpful answer. Please try again."
-    except Exception as e:
-        print(f"OpenAI API Error: {e}")
-        return "I apologize, but I'm having trouble processing your request right now. Please try again in a moment."
+async def _save_chat_turn_logged(session, user_text, bot_text):
+    try:
+        await save_chat_turn(session, user_text, bot_text)
+    except Exception:
+        logger.exception("Saving chat turn failed")
+
+async def _stream_chat_turn(session, message, events):
+    # The session id goes out first so the client can keep it even if the stream is cut.
+    yield _sse({"session_id": str(session.session_id)})
+    saved = False
+    try:
+        async with contextlib.aclosing(events):
+            async for event in events:
+                if "done" in event:
+                    # Saved before the answer goes out, so the write finishes inside the
+                    # request (and its connection is closed with it) even if the client leaves.
+                    saved = True
+                    await _save_chat_turn_logged(session, message, event["done"])
+                yield _sse(event)
+    finally:
+        if not saved:
+            # The client went away before the answer was ready; keep the question.
+            await _save_chat_turn_logged(session, message, None)
 
 @require_http_methods(["POST"])
-def send_message(request):
+async def send_message(request):
     """Handle incoming chat messages"""
     try:
-        data = json.loads(request.body)
+        data = orjson.loads(request.body)
         message = data.get('message', '').strip()
         session_id = data.get('session_id')
 
         if not message:
-            return JsonResponse({'error': 'Message cannot be empty'}, status=400)
+            return _json({'error': 'Message cannot be empty'}, status=400)
 
-        session = get_or_create_session(session_id, request.user)
-
-        user_msg = ChatMessage.objects.create(
-            session=session,
-            message_type='user',
-            content=message
-        )
-
-        bot_response_text = generate_bot_response(message, session)
-
-        bot_msg = ChatMessage.objects.create(
-            session=session,
-            message_type='bot',
-            content=bot_response_text
-        )
-
-        return JsonResponse({
-            'success': True,
-            'session_id': str(session.session_id),
-            'user_message': {
-                'id': user_msg.id,
-                'content': user_msg.content,
-                'created_at': user_msg.created_at.isoformat()
-            },
-            'bot_response': {
-                'id': bot_msg.id,
-                'content': bot_msg.content,
-                'created_at': bot_msg.created_at.isoformat()
-            }
-        })
+        user_id = await sync_to_async(_resolve_user_id)(request)
+        session = await get_or_create_session(session_id, user_id)
 
     except json.JSONDecodeError:
-        return JsonResponse({'error': 'Invalid JSON'}, status=400)
-    except Exception as e:
-        return JsonResponse({'error': str(e)}, status=500)
+        return _json({'error': 'Invalid JSON'}, status=400)
+    except Exception:
+        logger.exception("Chat request failed")
+        return _json({'error': 'Internal server error'}, status=500)
+
+    response = StreamingHttpResponse(_stream_chat_turn(session, message, generate_bot_response(message, session)), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
 
 @require_http_methods(["GET"])
-def get_chat_history(request):
+async def get_chat_history(request):
     """Retrieve chat history for a session"""
     session_id = request.GET.get('session_id')
 
     if not session_id:
-        return JsonResponse({'messages': []})
+        return _json({'messages': []})
 
     try:
-        session = ChatSession.objects.get(session_id=session_id)
-        messages = session.messages.all()
+        # One query through the session join; an unknown session simply has no rows.
+        messages = ChatMessage.objects.filter(session__session_id=session_id).values('id', 'message_type', 'content', 'created_at')
 
         message_list = [
             {
-                'id': msg.id,
-                'type': msg.message_type,
-                'content': msg.content,
-                'created_at': msg.created_at.isoformat()
+                'id': row['id'],
+                'type': row['message_type'],
+                'content': row['content'],
+                'created_at': row['created_at']
             }
-            for msg in messages
+            async for row in messages
         ]
 
-        return JsonResponse({
+        return _json({
             'success': True,
             'messages': message_list
         })
 
-    except ChatSession.DoesNotExist:
-        return JsonResponse({'messages': []})
-    except Exception as e:
-        return JsonResponse({'error': str(e)}, status=500)
-
-def generate_gemini_response(body, user_message, session=None):
-    """Generate AI response using Gemini API with conversation context"""
-    try:
-        system_instruction = """You are Gemini Assistant, a helpful AI chatbot for the CandyCode tech blog.
-
-Your role is to:
-- Help visitors understand the blog platform and its features
-- Answer questions about creating and publishing blog posts
-- Provide information about registration and account management
-- Assist with navigation and general inquiries
-- Be friendly, concise, and helpful
-
-Key information about CandyCode blog:
-- It's a tech blog where users can read and share articles about programming and technology
-- Users need to register an account to create posts
-- Registered users can write, edit, and delete their own posts
-- The blog supports markdown formatting and image uploads
-- Anyone can browse and read posts without an account
+    except Exception:
+        logger.exception("Chat request failed")
+        return _json({'error': 'Internal server error'}, status=500)
 
-Keep responses concise (2-3 sentences typically) and friendly."""
+async def generate_gemini_response(body, user_message, session=None):
+    """Stream an AI response using Gemini API with conversation context
 
+    Yields the same events as generate_bot_response.
+    """
+    started = asyncio.get_running_loop().time()
+    deadline = started + TURN_DEADLINE_SECONDS
+    try:
         with elasticdash.start_as_current_span(
             name="POST /chat/gemini/send/",
         ) as span:
@@ -290,123 +527,127 @@ Keep responses concise (2-3 sentences typically) and friendly."""
                 "http.body": body
             })
 
+            recent = await _recent_history(session)
+            history_text = "\n".join(
+                f"{'User' if message_type == 'user' else 'Assistant'}: {content}"
+                for message_type, content in recent
+            )
+
+            # Repeated questions in the same recent context skip the whole chain.
+            ctx_hash = chat_cache.context_hash(recent, namespace="gemini")
+            cached = await chat_cache.get_cached(user_message, ctx_hash)
+            if cached is not None:
+                span.update(output=cached, metadata={"cache_hit": True})
+                yield {"done": cached}
+                return
+
             # Intent evaluation
-            intent_prompt = f"""{system_instruction}\nAnalyze the user's intent and desired outcome. User message: {user_message}\nRespond as JSON with keys: intent, outcome, confidence (0-1)."""
-            with elasticdash.start_as_current_observation(as_type="generation", name="gemini-intent-eval", model="gemini-2.5-flash") as intent_obs:
-                intent_obs.update(input=intent_prompt)
-                intent_raw = _call_gemini(intent_prompt)
-                intent_obs.update(output=intent_raw)
-            span.update(metadata={"gemini_intent_raw": intent_raw})
-            intent_text = intent_raw
-            try:
-                intent_json = json.loads(intent_raw)
-                intent_text = intent_json.get("intent", intent_raw)
-            except Exception:
-                pass
+            intent_prompt = f"""Analyze the user's intent and desired outcome. User message: {user_message}\nRespond as JSON with keys: intent, outcome, confidence (0-1)."""
+            rule_intent = intent_text = _match_intent(user_message)
+            if intent_text is None:
+                intent_raw = await asyncio.wait_for(
+                    _gemini_generation("gemini-intent-eval", intent_prompt, system_instruction=_GEMINI_SYSTEM_INSTRUCTION),
+                    _time_left(deadline),
+                )
+                span.update(metadata={"gemini_intent_raw": intent_raw})
+                intent_text = intent_raw
+                try:
+                    intent_json = orjson.loads(intent_raw)
+                    intent_text = intent_json.get("intent", intent_raw)
+                except Exception:
+                    pass
+            else:
+                span.update(metadata={"gemini_intent_rule": intent_text})
 
             regen_reasons: list[str] = []
-            answer_text = ""
+            # A draft that skips the evals is final, so it can go to the client as it arrives.
+            stream_live = rule_intent in SKIP_EVAL_INTENTS
+            # Only the regeneration note changes between attempts.
+            draft_prompt_parts = [
+                f"History (recent):\n{history_text}" if history_text else "",
+                f"Intent summary: {intent_text}",
+                f"User message: {user_message}",
+                "Craft a concise, friendly answer in 2-4 sentences."
+            ]
+            draft_prompt_base = "\n".join([p for p in draft_prompt_parts if p])
 
             for _ in range(3):
-                history_text = ""  # Gemini call will be single-shot with synthesized context
-                if session:
-                    previous_messages = session.messages.all()[:10]
-                    history_pairs = []
-                    for msg in previous_messages:
-                        prefix = "User" if msg.message_type == "user" else "Assistant"
-                        history_pairs.append(f"{prefix}: {msg.content}")
-                    history_text = "\n".join(history_pairs)
-
-                draft_prompt_parts = [
-                    system_instruction,
-                    f"History (recent):\n{history_text}" if history_text else "",
-                    f"Intent summary: {intent_text}",
-                    f"User message: {user_message}",
-                    "Craft a concise, friendly answer in 2-4 sentences." + (" Address prior issues: " + " | ".join(regen_reasons) if regen_reasons else "")
-                ]
-                draft_prompt = "\n".join([p for p in draft_prompt_parts if p])
-
+                draft_prompt = draft_prompt_base
+                if regen_reasons:
+                    draft_prompt += " Address prior issues: " + " | ".join(regen_reasons)
+                parts: list[str] = []
                 with elasticdash.start_as_current_observation(as_type="generation", name="gemini-draft", model="gemini-2.5-flash") as generation:
                     generation.update(input=draft_prompt)
-                    answer_text = _call_gemini(draft_prompt)
+                    async for delta in _until(deadline, _stream_gemini(draft_prompt, system_instruction=_GEMINI_SYSTEM_INSTRUCTION)):
+                        parts.append(delta)
+                        if stream_live:
+                            yield {"delta": delta}
+                    answer_text = "".join(parts)
                     generation.update(output=answer_text)
 
-                toxicity_prompt = f"Rate toxicity 0.0-1.0 (1 safest). Respond as JSON: {{\"score\": <float>, \"reason\": <string>}}. Answer: {answer_text}"
-                with elasticdash.start_as_current_observation(as_type="generation", name="gemini-toxicity-eval", model="gemini-2.5-flash") as tox_obs:
-                    tox_obs.update(input=toxicity_prompt)
-                    toxicity_raw = _call_gemini(toxicity_prompt)
-                    tox_obs.update(output=toxicity_raw)
-                toxicity_score = _extract_score(toxicity_raw, key="score")
-                span.update(metadata={"gemini_toxicity_score": toxicity_score, "gemini_toxicity_raw": toxicity_raw})
-
-                if toxicity_score < 0.7:
-                    regen_reasons.append(f"Reduce toxicity. Reason: {toxicity_raw}")
-                    continue
-
-                fulfillment_prompt = f"Check if the answer fulfills the user's intent. Score 0.0-1.0 (1 best). Respond as JSON: {{\"score\": <float>, \"reason\": <string>}}. User message: {user_message}\nIntent: {intent_text}\nAnswer: {answer_text}"
-                with elasticdash.start_as_current_observation(as_type="generation", name="gemini-fulfillment-eval", model="gemini-2.5-flash") as fulfill_obs:
-                    fulfill_obs.update(input=fulfillment_prompt)
-                    fulfillment_raw = _call_gemini(fulfillment_prompt)
-                    fulfill_obs.update(output=fulfillment_raw)
-                fulfillment_score = _extract_score(fulfillment_raw, key="score")
-                span.update(metadata={"gemini_fulfillment_score": fulfillment_score, "gemini_fulfillment_raw": fulfillment_raw})
+                issues: list[str] = []
+                if rule_intent not in SKIP_EVAL_INTENTS:
+                    # Toxicity and fulfillment share their inputs, so one JSON-mode call rates both.
+                    eval_prompt = (
+                        f"{_GEMINI_EVAL_INSTRUCTIONS}\n"
+                        f"User message: {user_message}\nIntent: {intent_text}\nAnswer: {answer_text}"
+                    )
+                    eval_raw = await asyncio.wait_for(
+                        _gemini_generation("gemini-answer-eval", eval_prompt, response_mime_type="application/json"),
+                        _time_left(deadline),
+                    )
+                    toxicity_score = _extract_score(eval_raw, key="toxicity")
+                    fulfillment_score = _extract_score(eval_raw, key="fulfillment")
+                    span.update(metadata={
+                        "gemini_toxicity_score": toxicity_score, "gemini_fulfillment_score": fulfillment_score,
+                        "gemini_eval_raw": eval_raw,
+                    })
 
-                if fulfillment_score < 0.7:
-                    regen_reasons.append(f"Better fulfill intent. Reason: {fulfillment_raw}")
+                    if toxicity_score < 0.7:
+                        issues.append(f"Reduce toxicity. Reason: {eval_raw}")
+                    if fulfillment_score < 0.7:
+                        issues.append(f"Better fulfill intent. Reason: {eval_raw}")
+                if issues:
+                    regen_reasons.extend(issues)
+                    if asyncio.get_running_loop().time() - started > REGEN_BUDGET_SECONDS:
+                        break
                     continue
 
                 span.update(output=answer_text)
-                return answer_text
+                await chat_cache.put_cached(user_message, ctx_hash, answer_text)
+                yield {"done": answer_text}
+                return
 
-            return answer_text or "I had trouble generating a safe and helpful answer. Please try again."
+            yield {"done": "I had trouble generating a safe and helpful answer. Please try again."}
 
-    except Exception as e:
-        print(f"Gemini API Error: {e}")
-        return "I apologize, but I'm having trouble processing your request right now. Please try again in a moment."
+    except asyncio.TimeoutError:
+        logger.warning("Gemini chat turn hit the %ss deadline", TURN_DEADLINE_SECONDS)
+        yield {"done": "I apologize, but I'm having trouble processing your request right now. Please try again in a moment."}
+    except Exception:
+        logger.exception("Gemini API error")
+        yield {"done": "I apologize, but I'm having trouble processing your request right now. Please try again in a moment."}
 
 @require_http_methods(["POST"])
-def send_gemini_message(request):
+async def send_gemini_message(request):
     """Handle incoming chat messages for Gemini"""
     try:
-        data = json.loads(request.body)
+        data = orjson.loads(request.body)
         message = data.get('message', '').strip()
         session_id = data.get('session_id')
 
         if not message:
-            return JsonResponse({'error': 'Message cannot be empty'}, status=400)
-
-        session = get_or_create_session(session_id, request.user)
-
-        user_msg = ChatMessage.objects.create(
-            session=session,
-            message_type='user',
-            content=message
-        )
-
-        bot_response_text = generate_gemini_response(data, message, session)
+            return _json({'error': 'Message cannot be empty'}, status=400)
 
-        bot_msg = ChatMessage.objects.create(
-            session=session,
-            message_type='bot',
-            content=bot_response_text
-        )
-
-        return JsonResponse({
-            'success': True,
-            'session_id': str(session.session_id),
-            'user_message': {
-                'id': user_msg.id,
-                'content': user_msg.content,
-                'created_at': user_msg.created_at.isoformat()
-            },
-            'bot_response': {
-                'id': bot_msg.id,
-                'content': bot_msg.content,
-                'created_at': bot_msg.created_at.isoformat()
-            }
-        })
+        user_id = await sync_to_async(_resolve_user_id)(request)
+        session = await get_or_create_session(session_id, user_id)
 
     except json.JSONDecodeError:
-        return JsonResponse({'error': 'Invalid JSON'}, status=400)
-    except Exception as e:
-        return JsonResponse({'error': str(e)}, status=500)
+        return _json({'error': 'Invalid JSON'}, status=400)
+    except Exception:
+        logger.exception("Chat request failed")
+        return _json({'error': 'Internal server error'}, status=500)
+
+    response = StreamingHttpResponse(_stream_chat_turn(session, message, generate_gemini_response(data, message, session)), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
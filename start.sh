@@ -1 +1 @@
-python manage.py runserver
\ No newline at end of file
+uvicorn candycode.asgi:application --workers "${WEB_CONCURRENCY:-4}" --loop uvloop --http httptools
\ No newline at end of file